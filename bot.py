@@ -9,6 +9,7 @@ from threading import Thread
 import firebase_admin
 from firebase_admin import credentials, firestore
 import traceback
+import re
 import logging
 logging.basicConfig(level=logging.INFO)
 import asyncio
@@ -171,7 +172,44 @@ Above all: you’re Remy — calm, magnetic, and in control behind the bar.
 """
 
 # Conversation history configuration
-MAX_HISTORY_LENGTH = 10  # Keep last 10 messages per channel
+# Everything in the buffer is sent raw and everything older lives in the summary,
+# so the prompt never has a gap between the two
+SUMMARY_KEEP_RECENT = 5  # Raw messages left in the buffer after compaction
+MAX_HISTORY_LENGTH = SUMMARY_KEEP_RECENT * 2  # Compact a channel's history once it holds this many messages
+HISTORY_HARD_LIMIT = MAX_HISTORY_LENGTH * 3  # Drop oldest messages past this if compaction keeps failing
+MAX_SUMMARY_TOKENS = 200
+COMPACTION_RETRY_SECONDS = 60  # First cooldown after a failed compaction, doubled on each failure
+MAX_COMPACTION_RETRY_SECONDS = 3600
+
+SUMMARY_PROMPT = """
+You maintain Remy's memory of a bar channel. Merge the previous summary and the new messages into one short running summary (at most 5 sentences).
+Keep who said what, names, drinks mentioned, moods and any running jokes. Drop small talk that doesn't matter later.
+"""
+
+# In-flight compactions and (failure count, retry time) after failures, keyed by (server_id, channel_id)
+compaction_jobs = {}
+compaction_backoff = {}
+
+# Bulk grant configuration
+GRANT_BATCH_SIZE = 200  # Users per Firestore batch (batches cap at 500 writes)
+ACTIVE_HISTORY_LIMIT = 1000  # Bar channel messages scanned for active users
+RANDOM_DRINK_OPTION = "random"
+GRANT_MIN_MATCH_SCORE = 80  # Reject fuzzy drink matches below this, a typo shouldn't reach a whole role
+GRANT_MAX_RETRIES = 5  # Attempts per chunk before the job is marked failed
+GRANT_RETRY_SECONDS = 2  # First retry delay for a failed chunk, doubled on each attempt
+
+# Listing role members needs the privileged Server Members intent, which must also be
+# enabled in the developer portal or the bot can't connect at all
+MEMBERS_INTENT_ENABLED = os.getenv("ENABLE_MEMBERS_INTENT", "").lower() in ("1", "true", "yes")
+
+def format_grant_drink(drink_key):
+    """Describe the drink a bulk grant hands out"""
+    if drink_key == RANDOM_DRINK_OPTION:
+        return "a random new drink"
+    return f"**{cocktails[drink_key]['name']}** {cocktails[drink_key]['emoji']}"
+
+# Running bulk grant tasks keyed by job ID
+grant_tasks = {}
 
 # Random selection utilities
 def get_random_drink():
@@ -200,25 +238,87 @@ def save_user_to_firestore(user_id, user_data):
     user_ref = db.collection("users").document(user_id)
     user_ref.set(user_data, merge=True)
 
+def add_drink_to_user(user_id, drink, message_count=None):
+    # ArrayUnion instead of writing back a list we read earlier, so a concurrent
+    # grant (e.g. a /bulkgive chunk) is never overwritten by a stale drinks list
+    user_data = {"drinks": firestore.ArrayUnion([drink])}
+    if message_count is not None:
+        user_data["message_count"] = message_count
+    save_user_to_firestore(user_id, user_data)
+
+def create_grant_job(job_data):
+    # Store the bulk grant job so it can be resumed if the bot goes down
+    job_ref = db.collection("grant_jobs").document()
+    job_ref.set(job_data)
+    return job_ref.id
+
+def commit_grant_chunk(job_id, user_ids, cocktail, next_index):
+    """Give a drink to a chunk of users and record job progress in one batch write.
+    Returns the job's total number of drinks granted so far."""
+    batch = db.batch()
+    job_ref = db.collection("grant_jobs").document(job_id)
+    user_refs = [db.collection("users").document(user_id) for user_id in user_ids]
+    granted = 0
+    
+    # One read for the job and the whole chunk to see what everyone already owns
+    job_data = {}
+    owned = {}
+    for doc in db.get_all([job_ref] + user_refs):
+        if doc.reference.path == job_ref.path:
+            job_data = doc.to_dict() or {}
+        else:
+            owned[doc.id] = set(doc.to_dict().get("drinks", [])) if doc.exists else set()
+    
+    # A retry after a commit that went through but reported an error must not grant twice
+    if job_data.get("next_index", 0) >= next_index:
+        return job_data.get("granted", 0)
+    
+    for user_ref in user_refs:
+        user_drinks = owned.get(user_ref.id, set())
+        if cocktail == RANDOM_DRINK_OPTION:
+            drink = get_random_drink_not_owned(user_drinks)
+        else:
+            drink = cocktail if cocktail not in user_drinks else None
+        
+        if drink:
+            batch.set(user_ref, {"drinks": firestore.ArrayUnion([drink])}, merge=True)
+            granted += 1
+    
+    batch.update(job_ref, {"next_index": next_index, "granted": firestore.Increment(granted)})
+    batch.commit()
+    return job_data.get("granted", 0) + granted
+
+def set_grant_job_status(job_id, status):
+    db.collection("grant_jobs").document(job_id).update({"status": status})
+
+def get_grant_jobs(statuses):
+    docs = db.collection("grant_jobs").where("status", "in", statuses).stream()
+    return [(doc.id, doc.to_dict()) for doc in docs]
+
+def get_server_data(server_id):
+    doc = db.collection("servers").document(server_id).get()
+    return doc.to_dict() if doc.exists else {}
+
+@firestore.transactional
+def append_history_message(transaction, server_ref, channel_id, message_entry):
+    # Runs in a transaction so it can't interleave with a compaction of the same channel
+    doc = server_ref.get(transaction=transaction)
+    server_data = doc.to_dict() if doc.exists else {}
+    channel_messages = server_data.get("conversation_history", {}).get(channel_id, [])
+    channel_messages.append(message_entry)
+    
+    # Safety net: only drop raw messages if compaction hasn't caught up
+    if len(channel_messages) > HISTORY_HARD_LIMIT:
+        channel_messages = channel_messages[-HISTORY_HARD_LIMIT:]
+    
+    # Only touch this channel's history, never the rest of the server document
+    transaction.set(server_ref, {"conversation_history": {channel_id: channel_messages}}, merge=True)
+    return len(channel_messages)
+
 def add_message_to_history(server_id, channel_id, author_name, content, is_bot=False):
     """Add a message to the conversation history for a channel in Firebase"""
     try:
-        # Get the server document
         server_ref = db.collection("servers").document(server_id)
-        doc = server_ref.get()
-        
-        if doc.exists:
-            server_data = doc.to_dict()
-        else:
-            server_data = {}
-        
-        # Initialize conversation_history if it doesn't exist
-        if "conversation_history" not in server_data:
-            server_data["conversation_history"] = {}
-        
-        # Initialize channel history if it doesn't exist
-        if channel_id not in server_data["conversation_history"]:
-            server_data["conversation_history"][channel_id] = []
         
         # Add new message
         message_entry = {
@@ -228,50 +328,132 @@ def add_message_to_history(server_id, channel_id, author_name, content, is_bot=F
             "timestamp": asyncio.get_event_loop().time()
         }
         
-        server_data["conversation_history"][channel_id].append(message_entry)
-        
-        # Keep only the last MAX_HISTORY_LENGTH messages
-        if len(server_data["conversation_history"][channel_id]) > MAX_HISTORY_LENGTH:
-            server_data["conversation_history"][channel_id] = server_data["conversation_history"][channel_id][-MAX_HISTORY_LENGTH:]
+        history_length = append_history_message(db.transaction(), server_ref, channel_id, message_entry)
         
-        # Save back to Firebase
-        server_ref.set(server_data, merge=True)
+        # Buffer is full, fold older messages into the summary in the background
+        if history_length >= MAX_HISTORY_LENGTH:
+            schedule_history_compaction(server_id, channel_id)
         
     except Exception as e:
         logging.error(f"Error saving message to history: {e}")
 
-def get_conversation_context(server_id, channel_id, max_messages=5):
-    """Get recent conversation context for a channel from Firebase"""
+def format_history_lines(messages):
+    """Format stored history entries as 'Name: message' lines"""
+    lines = []
+    for msg in messages:
+        if msg.get("is_bot", False):
+            lines.append(f"Remy: {msg['content']}")
+        else:
+            lines.append(f"{msg['author']}: {msg['content']}")
+    return lines
+
+def schedule_history_compaction(server_id, channel_id):
+    """Start a background compaction for a channel unless one is already running"""
+    key = (server_id, channel_id)
+    if key in compaction_jobs:
+        return
+    
+    # Wait out the cooldown after a failure instead of calling OpenAI on every message
+    loop = asyncio.get_event_loop()
+    failures, retry_at = compaction_backoff.get(key, (0, 0))
+    if loop.time() < retry_at:
+        return
+    
+    def on_done(job):
+        compaction_jobs.pop(key, None)
+        if not job.cancelled() and job.result():
+            compaction_backoff.pop(key, None)
+        else:
+            delay = min(COMPACTION_RETRY_SECONDS * 2 ** failures, MAX_COMPACTION_RETRY_SECONDS)
+            compaction_backoff[key] = (failures + 1, loop.time() + delay)
+            logging.warning(f"Compaction failed for server: {server_id}, channel: {channel_id}, retrying in {delay}s")
+    
+    # Run the Firestore and OpenAI calls off the event loop so replies aren't held up
+    job = loop.run_in_executor(None, compact_conversation_history, server_id, channel_id)
+    compaction_jobs[key] = job
+    job.add_done_callback(on_done)
+
+def summarize_conversation(previous_summary, messages):
+    """Fold messages into the previous summary with OpenAI"""
+    new_lines = "\n".join(format_history_lines(messages))
+    response = openai.ChatCompletion.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Previous summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{new_lines}"}
+        ],
+        max_tokens=MAX_SUMMARY_TOKENS,
+        temperature=0.3
+    )
+    return response.choices[0].message.content.strip()
+
+@firestore.transactional
+def save_compacted_history(transaction, server_ref, channel_id, folded, summary):
+    # Re-read inside the transaction so messages appended while we were summarizing are kept
+    doc = server_ref.get(transaction=transaction)
+    server_data = doc.to_dict() if doc.exists else {}
+    current_messages = server_data.get("conversation_history", {}).get(channel_id, [])
+    remaining = [msg for msg in current_messages if msg not in folded]
+    
+    transaction.set(server_ref, {
+        "conversation_history": {channel_id: remaining},
+        "conversation_summaries": {channel_id: summary}
+    }, merge=True)
+
+def compact_conversation_history(server_id, channel_id):
+    """Fold all but the last SUMMARY_KEEP_RECENT messages of a channel into its rolling summary.
+    Returns False if the compaction failed."""
+    try:
+        server_ref = db.collection("servers").document(server_id)
+        doc = server_ref.get()
+        if not doc.exists:
+            return True
+        
+        server_data = doc.to_dict()
+        channel_messages = server_data.get("conversation_history", {}).get(channel_id, [])
+        if len(channel_messages) <= SUMMARY_KEEP_RECENT:
+            return True
+        
+        to_fold = channel_messages[:-SUMMARY_KEEP_RECENT]
+        previous_summary = server_data.get("conversation_summaries", {}).get(channel_id, "")
+        summary = summarize_conversation(previous_summary, to_fold)
+        
+        save_compacted_history(db.transaction(), server_ref, channel_id, to_fold, summary)
+        logging.info(f"Compacted {len(to_fold)} messages for server: {server_id}, channel: {channel_id}")
+        return True
+        
+    except Exception as e:
+        logging.error(f"Error compacting conversation history: {e}")
+        return False
+
+def get_conversation_context(server_id, channel_id, max_messages=None):
+    """Get the rolling summary and recent conversation context for a channel from Firebase.
+    By default the whole buffer is returned, since anything older is already in the summary."""
     try:
         # Get server document from Firebase
         server_ref = db.collection("servers").document(server_id)
         doc = server_ref.get()
         
         if not doc.exists:
-            return ""
+            return "", ""
         
         server_data = doc.to_dict()
+        summary = server_data.get("conversation_summaries", {}).get(channel_id, "")
         conversation_history = server_data.get("conversation_history", {})
         channel_messages = conversation_history.get(channel_id, [])
         
         if not channel_messages:
-            return ""
+            return summary, ""
         
         # Get the last max_messages
-        recent_messages = channel_messages[-max_messages:]
-        context_lines = []
+        recent_messages = channel_messages[-max_messages:] if max_messages else channel_messages
+        context_lines = format_history_lines(recent_messages)
         
-        for msg in recent_messages:
-            if msg.get("is_bot", False):
-                context_lines.append(f"Remy: {msg['content']}")
-            else:
-                context_lines.append(f"{msg['author']}: {msg['content']}")
-        
-        return "\n".join(context_lines)
+        return summary, "\n".join(context_lines)
         
     except Exception as e:
         logging.error(f"Error getting conversation context: {e}")
-        return ""
+        return "", ""
 
 async def get_ai_response(user_message, user_name, user_drinks=None, server_id=None, channel_id=None):
     """Get AI response from OpenAI based on user message and context"""
@@ -289,9 +471,11 @@ async def get_ai_response(user_message, user_name, user_drinks=None, server_id=N
         conversation_context = ""
         if server_id and channel_id:
             logging.info(f"Getting conversation context for server: {server_id}, channel: {channel_id}")
-            conversation_context = get_conversation_context(server_id, channel_id, max_messages=5)
-            if conversation_context:
-                conversation_context = f"\n\nRecent conversation:\n{conversation_context}"
+            summary, recent_context = get_conversation_context(server_id, channel_id)
+            if summary:
+                conversation_context += f"\n\nEarlier in the bar:\n{summary}"
+            if recent_context:
+                conversation_context += f"\n\nRecent conversation:\n{recent_context}"
         
         # Create the full prompt with menu included
         full_prompt = f"{AI_CHARACTER_PROMPT}\n\nCurrent Menu:\n{COCKTAIL_MENU}\n\n{drink_context}{conversation_context}\n\nUser ({user_name}) says: {user_message}\n\n"
@@ -341,6 +525,7 @@ async def get_ai_response(user_message, user_name, user_drinks=None, server_id=N
 intents = discord.Intents.default()
 intents.message_content = True
 intents.guilds = True
+intents.members = MEMBERS_INTENT_ENABLED  # Needed to list role members for /bulkgive
 client = discord.Client(intents=intents)
 tree = app_commands.CommandTree(client)
 
@@ -359,6 +544,9 @@ async def on_ready():
     except Exception as e:
         print("❌ OpenAI test failed:", e)
     
+    # Pick up bulk grants that were interrupted by a crash or restart
+    await resume_grant_jobs()
+    
     try:
         synced = await tree.sync()
         logging.info(f'Synced {len(synced)} global commands')
@@ -429,12 +617,7 @@ async def on_message(message):
                     drink_to_give = select_drink_to_give(user_drinks)
                     if drink_to_give:
                         # Add drink to user's collection
-                        user_drinks.add(drink_to_give)
-                        updated_data = {
-                            "drinks": list(user_drinks),
-                            "message_count": user_data.get("message_count", 0)
-                        }
-                        save_user_to_firestore(user_id, updated_data)
+                        add_drink_to_user(user_id, drink_to_give)
                         
                         # Send drink gift message
                         drink = cocktails[drink_to_give]
@@ -460,40 +643,33 @@ async def on_message(message):
     if not user_data:
         # First time user
         first_drink = get_random_drink()
-        new_data = {
-            "drinks": [first_drink],
-            "message_count": 0
-        }
         await message.channel.send(
             f"Welcome to the bar, {message.author.mention}. "
             f"Take a seat and relax. Here's your first drink on the house: {cocktails[first_drink]['name']} {cocktails[first_drink]['emoji']}"
         )
         
-        save_user_to_firestore(user_id, new_data)
+        add_drink_to_user(user_id, first_drink, message_count=0)
         return
 
     # Returning user
-    drinks = set(user_data.get("drinks", []))
     message_count = user_data.get("message_count", 0) + 1
+    drink_name = None
 
     if should_give_reward(message_count, base_chance=0.5):
         drink_name = get_random_drink()
-        drinks.add(drink_name)
         await message.channel.send(
             f"{message.author.mention}, here is your new drink: "
             f"{cocktails[drink_name]['name']} {cocktails[drink_name]['emoji']}. Keep the conversation going."
         )
-        message_count = 0  # Reset after reward
 
     # Add regular message to conversation history (for context)
     add_message_to_history(server_id, channel_id, message.author.display_name, message.content, is_bot=False)
     
-    # Save updates
-    updated_data = {
-        "drinks": list(drinks),
-        "message_count": message_count
-    }
-    save_user_to_firestore(user_id, updated_data)
+    # Save updates as field-level writes so concurrent grants aren't lost
+    if drink_name:
+        add_drink_to_user(user_id, drink_name, message_count=0)  # Reset after reward
+    else:
+        save_user_to_firestore(user_id, {"message_count": firestore.Increment(1)})
 
 @client.event
 async def on_disconnect():
@@ -616,25 +792,9 @@ async def give(interaction: discord.Interaction, user: discord.Member, cocktail:
 
         best_match, score = matches[0]
         
-        # Get the user's current data
-        user_id = str(user.id)
-        user_data = get_user_from_firestore(user_id)
-        
-        # Handle case where user_data might be None (though get_user_from_firestore should handle this)
-        if user_data is None:
-            user_data = {"drinks": [], "message_count": 0}
-        
-        user_drinks = set(user_data.get("drinks", []))
-        
         # Add the cocktail to user's collection
-        user_drinks.add(best_match)
-        
-        # Save updated data
-        updated_data = {
-            "drinks": list(user_drinks),
-            "message_count": user_data.get("message_count", 0)
-        }
-        save_user_to_firestore(user_id, updated_data)
+        user_id = str(user.id)
+        add_drink_to_user(user_id, best_match)
         
         # Send confirmation message
         drink = cocktails[best_match]
@@ -650,6 +810,205 @@ async def give(interaction: discord.Interaction, user: discord.Member, cocktail:
             ephemeral=True
         )
 
+async def commit_grant_chunk_with_retry(job_id, chunk, cocktail, next_index):
+    """Commit one chunk, retrying with backoff so a transient Firestore error doesn't end the job.
+    Returns the job's total number of drinks granted so far."""
+    loop = asyncio.get_event_loop()
+    for attempt in range(GRANT_MAX_RETRIES):
+        try:
+            # Firestore calls block, so run them off the event loop
+            return await loop.run_in_executor(None, commit_grant_chunk, job_id, chunk, cocktail, next_index)
+        except Exception as e:
+            if attempt == GRANT_MAX_RETRIES - 1:
+                raise
+            delay = GRANT_RETRY_SECONDS * 2 ** attempt
+            logging.warning(f"Bulk grant {job_id} chunk failed ({e}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+
+async def run_grant_job(job_id, job):
+    """Work through a bulk grant job in batches, posting progress to its channel"""
+    loop = asyncio.get_event_loop()
+    channel = client.get_channel(int(job["channel_id"]))
+    user_ids = job["user_ids"]
+    total = len(user_ids)
+    index = job.get("next_index", 0)
+    granted = job.get("granted", 0)
+    
+    start_index = index
+    start_time = loop.time()
+    try:
+        label = format_grant_drink(job["cocktail"])
+        
+        progress = None
+        if channel:
+            try:
+                progress = await channel.send(f"🍸 Pouring {label} for {total} members... {index}/{total}")
+            except discord.HTTPException as e:
+                logging.warning(f"Could not post bulk grant progress: {e}")
+        
+        while index < total:
+            chunk = user_ids[index:index + GRANT_BATCH_SIZE]
+            granted = await commit_grant_chunk_with_retry(job_id, chunk, job["cocktail"], index + len(chunk))
+            index += len(chunk)
+            
+            if progress:
+                try:
+                    await progress.edit(content=f"🍸 Pouring {label} for {total} members... {index}/{total}")
+                except discord.HTTPException as e:
+                    logging.warning(f"Could not update bulk grant progress: {e}")
+        
+        await loop.run_in_executor(None, set_grant_job_status, job_id, "done")
+        
+        elapsed = loop.time() - start_time
+        processed = index - start_index
+        rate = processed / elapsed if elapsed > 0 else processed
+        logging.info(f"Bulk grant {job_id} finished: {processed} users in {elapsed:.2f}s ({rate:.1f} users/s)")
+        if channel:
+            try:
+                await channel.send(
+                    f"✅ Bulk grant done! {granted} drinks poured for {total} members "
+                    f"in {elapsed:.1f}s ({rate:.1f} members/s)."
+                )
+            except discord.HTTPException as e:
+                logging.warning(f"Could not post bulk grant result: {e}")
+        
+    except Exception as e:
+        logging.error(f"Error in bulk grant {job_id}: {e}")
+        logging.error(f"Full traceback: {traceback.format_exc()}")
+        try:
+            await loop.run_in_executor(None, set_grant_job_status, job_id, "failed")
+            if channel:
+                await channel.send(f"❌ Bulk grant stopped after {index}/{total} members. Use /resumegrants to pick it up again.")
+        except Exception as e:
+            logging.error(f"Could not record bulk grant {job_id} failure: {e}")
+    finally:
+        grant_tasks.pop(job_id, None)
+
+async def resume_grant_jobs(statuses=("running",)):
+    """Restart bulk grant jobs with the given statuses in Firestore, returns how many were started"""
+    loop = asyncio.get_event_loop()
+    try:
+        jobs = await loop.run_in_executor(None, get_grant_jobs, list(statuses))
+    except Exception as e:
+        logging.error(f"Failed to load bulk grant jobs: {e}")
+        return 0
+    
+    resumed = 0
+    for job_id, job in jobs:
+        if job_id in grant_tasks:
+            continue
+        if job.get("status") != "running":
+            try:
+                await loop.run_in_executor(None, set_grant_job_status, job_id, "running")
+            except Exception as e:
+                logging.error(f"Could not mark bulk grant {job_id} as running, skipping it: {e}")
+                continue
+        logging.info(f"Resuming bulk grant {job_id} at {job.get('next_index', 0)}/{len(job['user_ids'])}")
+        grant_tasks[job_id] = asyncio.create_task(run_grant_job(job_id, job))
+        resumed += 1
+    return resumed
+
+@tree.command(name="resumegrants", description="Resume interrupted or failed bulk grants. (Owner only)")
+async def resumegrants(interaction: discord.Interaction):
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("You're not allowed to use this command.", ephemeral=True)
+        return
+
+    await interaction.response.defer(thinking=True, ephemeral=True)
+    try:
+        resumed = await resume_grant_jobs(statuses=("running", "failed"))
+        await interaction.followup.send(f"Resumed {resumed} bulk grant(s).")
+    except Exception as e:
+        logging.error(f"Error in resumegrants command: {e}")
+        logging.error(f"Full traceback: {traceback.format_exc()}")
+        await interaction.followup.send("❌ Failed to resume bulk grants. Please check the logs.")
+
+@tree.command(name="bulkgive", description="Give a cocktail to many users at once. (Owner only)")
+@app_commands.describe(
+    cocktail="The name of the cocktail to give, or 'random' for a random drink each user doesn't own",
+    role="Give to everyone with this role",
+    users="Mention the users to give to",
+    active="Give to everyone who has chatted recently in the bar channel"
+)
+async def bulkgive(interaction: discord.Interaction, cocktail: str, role: discord.Role = None, users: str = None, active: bool = False):
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("You're not allowed to use this command.", ephemeral=True)
+        return
+
+    await interaction.response.defer(thinking=True, ephemeral=True)
+
+    try:
+        # Resolve the cocktail once for the whole job
+        if cocktail.strip().lower() == RANDOM_DRINK_OPTION:
+            drink_key = RANDOM_DRINK_OPTION
+        else:
+            matches = process.extract(cocktail, cocktails.keys(), limit=1)
+            if not matches or matches[0][1] < GRANT_MIN_MATCH_SCORE:
+                await interaction.followup.send("No cocktail found with that name. Try again or check your spelling.")
+                return
+            drink_key = matches[0][0]
+
+        if role and not MEMBERS_INTENT_ENABLED:
+            await interaction.followup.send(
+                "Giving to a role needs the Server Members intent. Set ENABLE_MEMBERS_INTENT and enable it in the developer portal."
+            )
+            return
+
+        # Collect recipients, keeping order and skipping duplicates
+        recipients = {}
+        if role:
+            for member in role.members:
+                if not member.bot:
+                    recipients[str(member.id)] = True
+
+        if users:
+            for user_id in re.findall(r"<@!?(\d+)>", users):
+                member = interaction.guild.get_member(int(user_id))
+                if member is None:
+                    try:
+                        member = await interaction.guild.fetch_member(int(user_id))
+                    except discord.NotFound:
+                        continue
+                if not member.bot:
+                    recipients[user_id] = True
+
+        if active:
+            loop = asyncio.get_event_loop()
+            server_data = await loop.run_in_executor(None, get_server_data, str(interaction.guild.id))
+            bar_channel_id = server_data.get("bar_channel")
+            bar_channel = interaction.guild.get_channel(int(bar_channel_id)) if bar_channel_id else None
+            if not bar_channel:
+                await interaction.followup.send("No bar channel is set for this server. Use /setbar first.")
+                return
+            async for msg in bar_channel.history(limit=ACTIVE_HISTORY_LIMIT):
+                if not msg.author.bot:
+                    recipients[str(msg.author.id)] = True
+
+        if not recipients:
+            await interaction.followup.send("No one to give drinks to. Pick a role, mention some users, or use active.")
+            return
+
+        job = {
+            "server_id": str(interaction.guild.id),
+            "channel_id": str(interaction.channel.id),
+            "cocktail": drink_key,
+            "user_ids": list(recipients),
+            "next_index": 0,
+            "granted": 0,
+            "status": "running",
+            "created_at": firestore.SERVER_TIMESTAMP
+        }
+        loop = asyncio.get_event_loop()
+        job_id = await loop.run_in_executor(None, create_grant_job, job)
+        grant_tasks[job_id] = asyncio.create_task(run_grant_job(job_id, job))
+
+        await interaction.followup.send(f"Bulk grant started: {format_grant_drink(drink_key)} for {len(recipients)} members.")
+
+    except Exception as e:
+        logging.error(f"Error in bulkgive command: {e}")
+        logging.error(f"Full traceback: {traceback.format_exc()}")
+        await interaction.followup.send("❌ Failed to start the bulk grant. Please try again or check the logs.")
+
 async def start_bot():
     while True:
         try: